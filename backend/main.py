@@ -2,15 +2,40 @@
 FastAPI Backend for Google Maps Integration
 """
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+import httpx
+import msgspec
+import orjson
+import redis.asyncio as redis
+from aiobreaker import CircuitBreaker, CircuitBreakerError
+from aiolimiter import AsyncLimiter
+from async_lru import alru_cache
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    retry_if_result,
+    stop_after_attempt,
+    wait_exponential,
+)
+import hashlib
+import logging
 import os
-from typing import Optional, Dict, Any
-from urllib.parse import quote
+import re
+from typing import Optional, Dict, Any, List, Union
+from urllib.parse import quote, urlencode
 import time
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Google Maps API Backend", version="1.0.0")
+app = FastAPI(
+    title="Google Maps API Backend",
+    version="1.0.0",
+    default_response_class=ORJSONResponse
+)
 
 # Add CORS middleware
 app.add_middleware(
@@ -21,13 +46,169 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON responses
+app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=5)
+
 # Configuration
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
 DEFAULT_RADIUS = 5000
 MAX_RESULTS = 5
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+LOCATION_CACHE_TTL = 600  # 10 minutes
+PLACES_CACHE_TTL = 600  # 10 minutes
+DIRECTIONS_CACHE_TTL = 3600  # 1 hour
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))  # matches the uvicorn CLI default
+GOOGLE_MAX_QPS = int(os.getenv("GOOGLE_MAX_QPS", "10"))  # total across all workers
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+RETRY_API_STATUSES = ("OVER_QUERY_LIMIT", "UNKNOWN_ERROR")  # sent with HTTP 200
+
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+_MAPS_PLACE_PREFIX = "https://www.google.com/maps/place/?q=place_id:"
+_MAPS_DIR_PREFIX = "https://www.google.com/maps/dir/"
+_MAPS_EMBED_PREFIX = "https://www.google.com/maps/embed/v1/search?"
+
+# Google Places response shapes; fields not declared here are skipped while decoding
+class GooglePlace(msgspec.Struct):
+    name: str = "Unknown"
+    formatted_address: str = "Address not available"
+    rating: Optional[Union[int, float]] = None  # keep Google's int/float as sent
+    place_id: Optional[str] = None
+
+class GooglePlacesResponse(msgspec.Struct):
+    status: str
+    results: List[GooglePlace] = []  # Text Search
+    candidates: List[GooglePlace] = []  # Find Place
+    error_message: Optional[str] = None
+
+places_decoder = msgspec.json.Decoder(GooglePlacesResponse)
+
+class GoogleStatus(msgspec.Struct):
+    status: str = ""
+
+status_decoder = msgspec.json.Decoder(GoogleStatus)
+
+class GoogleRetryableStatus(Exception):
+    """Google answered 200 but reported a transient error in the body status."""
+
+    def __init__(self, status: str):
+        super().__init__(status)
+        self.status = status
+
+# Client-side throttle for Google Maps calls; each worker process gets an
+# equal share of GOOGLE_MAX_QPS (one token per 1/rate seconds below 1 QPS)
+_worker_qps = GOOGLE_MAX_QPS / WEB_CONCURRENCY
+google_limiter = AsyncLimiter(
+    max_rate=max(1.0, _worker_qps),
+    time_period=max(1.0, _worker_qps) / _worker_qps
+)
+
+# Fail fast while Google Maps is degraded
+google_breaker = CircuitBreaker(fail_max=5, timeout_duration=timedelta(seconds=30))
+
+def raise_last_outcome(retry_state):
+    """Raise the final failed attempt so the circuit breaker counts it."""
+    retry_state.outcome.result().raise_for_status()
+
+@google_breaker
+@retry(
+    wait=wait_exponential(multiplier=0.2, max=5),
+    retry=(
+        retry_if_exception_type((httpx.HTTPError, GoogleRetryableStatus))
+        | retry_if_result(lambda r: r.status_code in RETRY_STATUS_CODES)
+    ),
+    stop=stop_after_attempt(4),
+    retry_error_callback=raise_last_outcome,
+)
+async def google_get(url: str, params: Dict[str, Any]) -> httpx.Response:
+    """Rate-limited GET to Google Maps, retried with backoff on transient errors."""
+    async with google_limiter:
+        response = await app.state.http.get(url, params=params, timeout=10)
+    
+    # Quota and transient backend errors arrive as HTTP 200 with a body status
+    if response.status_code == 200:
+        try:
+            status = status_decoder.decode(response.content).status
+        except msgspec.DecodeError:
+            return response
+        if status in RETRY_API_STATUSES:
+            raise GoogleRetryableStatus(status)
+    
+    return response
+
+def is_single_place_query(query: str) -> bool:
+    """Guess whether the query names one specific place rather than a category."""
+    return query.lower().startswith("the ")
+
+async def cache_get(key: str) -> Optional[str]:
+    """Read a cached value; Redis errors are logged and treated as a miss."""
+    try:
+        return await app.state.redis.get(key)
+    except redis.RedisError as e:
+        logger.warning("Redis get failed for %s: %s", key, e)
+        return None
+
+async def cache_set(key: str, value: bytes, ttl: int) -> None:
+    """Write a cached value; Redis errors are logged and the write is skipped."""
+    try:
+        await app.state.redis.set(key, value, ex=ttl)
+    except redis.RedisError as e:
+        logger.warning("Redis set failed for %s: %s", key, e)
+
+def make_cache_key(prefix: str, *parts: str) -> str:
+    """Build a Redis key from request parameters."""
+    digest = hashlib.sha1("|".join(parts).lower().encode()).hexdigest()
+    return f"{prefix}:{digest}"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weakly compare an If-None-Match header (list, W/ tags or *) against etag."""
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == opaque:
+            return True
+    return False
+
+def etag_response(request: Request, content: bytes, max_age: int) -> Response:
+    """Send JSON content with ETag/Cache-Control headers, or 304 if the client copy is current."""
+    # Weak tag: GZipMiddleware may re-encode the body without changing the ETag
+    etag = f'W/"{hashlib.md5(content).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content, media_type="application/json", headers=headers)
 
-# Cache for user location
-location_cache = {}
+@app.on_event("startup")
+async def startup():
+    # Fail fast on misconfigured deploys instead of erroring per request
+    if not GOOGLE_MAPS_API_KEY:
+        raise RuntimeError("GOOGLE_MAPS_API_KEY is not configured")
+    
+    # Shared HTTP client for all outbound calls; pooled connections are
+    # kept alive so repeat calls to Google skip the TCP+TLS handshake
+    app.state.http = httpx.AsyncClient(
+        timeout=10.0,
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=200,
+            max_keepalive_connections=50,
+            keepalive_expiry=60.0
+        )
+    )
+    # Shared cache across workers
+    app.state.redis = redis.from_url(
+        REDIS_URL,
+        decode_responses=True,
+        socket_connect_timeout=1,
+        socket_timeout=1
+    )
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.http.aclose()
+    await app.state.redis.aclose()
 
 @app.get("/")
 async def root():
@@ -41,14 +222,12 @@ async def health_check():
 async def get_user_location(client_ip: Optional[str] = None):
     """Get user's current location using IP geolocation."""
     
-    cache_key = client_ip or "default"
-    current_time = time.time()
-    cache_duration = 600  # 10 minutes
+    cache_key = f"loc:{client_ip or 'default'}"
     
     # Check cache
-    if (cache_key in location_cache and 
-        current_time - location_cache[cache_key]["timestamp"] < cache_duration):
-        cached_data = location_cache[cache_key]["data"]
+    cached = await cache_get(cache_key)
+    if cached:
+        cached_data = orjson.loads(cached)
         return {
             "location": f"{cached_data['city']}, {cached_data['region']}, {cached_data['country']}",
             "coordinates": {"lat": cached_data["lat"], "lng": cached_data["lng"]},
@@ -56,12 +235,12 @@ async def get_user_location(client_ip: Optional[str] = None):
         }
     
     try:
-        response = requests.get(
+        response = await app.state.http.get(
             "http://ip-api.com/json/?fields=lat,lon,city,regionName,country", 
             timeout=5
         )
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             if data.get("lat") and data.get("lon"):
                 location_data = {
                     "lat": data["lat"],
@@ -72,10 +251,7 @@ async def get_user_location(client_ip: Optional[str] = None):
                 }
                 
                 # Cache the result
-                location_cache[cache_key] = {
-                    "data": location_data,
-                    "timestamp": current_time
-                }
+                await cache_set(cache_key, orjson.dumps(location_data), LOCATION_CACHE_TTL)
                 
                 return {
                     "location": f"{location_data['city']}, {location_data['region']}, {location_data['country']}",
@@ -88,77 +264,78 @@ async def get_user_location(client_ip: Optional[str] = None):
     
     raise HTTPException(status_code=500, detail="Unable to detect location")
 
-@app.get("/places/nearby")
-async def find_nearby_places(
-    query: str = Query(..., description="What to search for (e.g., 'cafe', 'restaurant')"),
-    location: Optional[str] = Query(None, description="Location to search near (optional)")
-):
-    """Find places nearby a location."""
-    
-    if not GOOGLE_MAPS_API_KEY:
-        raise HTTPException(status_code=500, detail="Google Maps API key not configured")
+@alru_cache(maxsize=1024, ttl=300)
+async def fetch_places(query: str, location: str) -> bytes:
+    """Fetch formatted places as JSON from Redis or Google (memoized, so immutable bytes)."""
     
-    # Auto-detect location if not provided
-    if not location:
-        try:
-            location_response = await get_user_location()
-            location = location_response["location"]
-        except:
-            raise HTTPException(status_code=400, detail="Could not determine location")
+    # Check cache
+    cache_key = make_cache_key("places", query, location)
+    cached = await cache_get(cache_key)
+    if cached:
+        return cached.encode()
     
     try:
-        # Google Places Text Search API
-        url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-        params = {
-            "query": f"{query} near {location}",
-            "key": GOOGLE_MAPS_API_KEY,
-            "radius": DEFAULT_RADIUS
-        }
+        if is_single_place_query(query):
+            # Google Places Find Place API (cheaper, single candidate)
+            url = "https://maps.googleapis.com/maps/api/place/findplacefromtext/json"
+            params = {
+                "input": f"{query} {location}",
+                "inputtype": "textquery",
+                "fields": "place_id,name,formatted_address,rating",
+                "key": GOOGLE_MAPS_API_KEY
+            }
+        else:
+            # Google Places Text Search API
+            url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+            params = {
+                "query": f"{query} near {location}",
+                "key": GOOGLE_MAPS_API_KEY,
+                "radius": DEFAULT_RADIUS
+            }
         
-        response = requests.get(url, params=params, timeout=10)
+        response = await google_get(url, params)
         response.raise_for_status()
-        data = response.json()
+        data = places_decoder.decode(response.content)
         
-        if data.get("status") != "OK":
-            raise HTTPException(status_code=400, detail=f"Google Maps API Error: {data.get('error_message', 'Unknown error')}")
+        if data.status != "OK":
+            raise HTTPException(status_code=400, detail=f"Google Maps API Error: {data.error_message or 'Unknown error'}")
         
-        places = data.get("results", [])[:MAX_RESULTS]
+        places = (data.results or data.candidates)[:MAX_RESULTS]
         
         if not places:
-            return {
+            result = {
                 "query": query,
                 "location": location,
                 "places": [],
                 "count": 0,
                 "message": f"No {query} found near {location}"
             }
+            content = orjson.dumps(result)
+            await cache_set(cache_key, content, PLACES_CACHE_TTL)
+            return content
         
         # Format places
-        formatted_places = []
-        for place in places:
-            name = place.get("name", "Unknown")
-            address = place.get("formatted_address", "Address not available")
-            rating = place.get("rating")
-            place_id = place.get("place_id")
-            
-            maps_url = f"https://www.google.com/maps/place/?q=place_id:{place_id}"
-            directions_url = f"https://www.google.com/maps/dir/{quote(location)}/{quote(address)}"
-            
-            formatted_place = {
-                "name": name,
-                "address": address,
-                "rating": rating,
-                "place_id": place_id,
-                "maps_url": maps_url,
-                "directions_url": directions_url
+        directions_prefix = _MAPS_DIR_PREFIX + quote(location, safe="") + "/"
+        formatted_places = [
+            {
+                "name": place.name,
+                "address": place.formatted_address,
+                "rating": place.rating,
+                "place_id": place.place_id,
+                "maps_url": _MAPS_PLACE_PREFIX + str(place.place_id),
+                "directions_url": directions_prefix + quote(place.formatted_address, safe="")
             }
-            formatted_places.append(formatted_place)
+            for place in places
+        ]
         
         # Generate embedded map URL
-        search_query = quote(f"{query} near {location}")
-        embed_url = f"https://www.google.com/maps/embed/v1/search?key={GOOGLE_MAPS_API_KEY}&q={search_query}&zoom=14"
+        embed_url = _MAPS_EMBED_PREFIX + urlencode({
+            "key": GOOGLE_MAPS_API_KEY,
+            "q": f"{query} near {location}",
+            "zoom": 14
+        })
         
-        return {
+        result = {
             "query": query,
             "location": location,
             "places": formatted_places,
@@ -166,21 +343,50 @@ async def find_nearby_places(
             "embed_map_url": embed_url
         }
         
-    except requests.RequestException as e:
+        # Cache the result
+        content = orjson.dumps(result)
+        await cache_set(cache_key, content, PLACES_CACHE_TTL)
+        
+        return content
+        
+    except HTTPException:
+        raise
+    except CircuitBreakerError:
+        raise HTTPException(status_code=503, detail="Google Maps temporarily unavailable")
+    except GoogleRetryableStatus as e:
+        raise HTTPException(status_code=503, detail=f"Google Maps API Error: {e.status}")
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"Network error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
-@app.get("/places/directions")
-async def get_directions(
-    origin: str = Query(..., description="Starting location"),
-    destination: str = Query(..., description="Destination location"),
-    mode: str = Query("driving", description="Travel mode (driving, walking, bicycling, transit)")
+@app.get("/places/nearby")
+async def find_nearby_places(
+    request: Request,
+    query: str = Query(..., description="What to search for (e.g., 'cafe', 'restaurant')"),
+    location: Optional[str] = Query(None, description="Location to search near (optional)")
 ):
-    """Get directions between two locations."""
+    """Find places nearby a location."""
     
-    if not GOOGLE_MAPS_API_KEY:
-        raise HTTPException(status_code=500, detail="Google Maps API key not configured")
+    # Auto-detect location if not provided
+    if not location:
+        try:
+            location_response = await get_user_location()
+            location = location_response["location"]
+        except:
+            raise HTTPException(status_code=400, detail="Could not determine location")
+    
+    content = await fetch_places(query, location)
+    return etag_response(request, content, PLACES_CACHE_TTL)
+
+async def fetch_directions(origin: str, destination: str, mode: str) -> Dict[str, Any]:
+    """Fetch formatted directions from Redis or Google."""
+    
+    # Check cache
+    cache_key = make_cache_key("dir", origin, destination, mode)
+    cached = await cache_get(cache_key)
+    if cached:
+        return orjson.loads(cached)
     
     try:
         # Google Directions API
@@ -192,9 +398,9 @@ async def get_directions(
             "key": GOOGLE_MAPS_API_KEY
         }
         
-        response = requests.get(api_url, params=params, timeout=10)
+        response = await google_get(api_url, params)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
         
         if data.get("status") != "OK":
             raise HTTPException(status_code=400, detail=f"Directions API Error: {data.get('error_message', 'Could not find route')}")
@@ -207,7 +413,7 @@ async def get_directions(
         leg = route["legs"][0]
         
         # Create Google Maps directions URL
-        directions_url = f"https://www.google.com/maps/dir/{quote(origin)}/{quote(destination)}"
+        directions_url = _MAPS_DIR_PREFIX + quote(origin, safe="") + "/" + quote(destination, safe="")
         if mode != "driving":
             mode_params = {
                 "walking": "w",
@@ -224,15 +430,14 @@ async def get_directions(
         for step in steps:
             instruction = step.get("html_instructions", "")
             # Remove HTML tags
-            import re
-            instruction = re.sub(r'<[^>]+>', '', instruction)
+            instruction = _HTML_TAG_RE.sub('', instruction)
             distance = step.get("distance", {}).get("text", "")
             formatted_steps.append({
                 "instruction": instruction,
                 "distance": distance
             })
         
-        return {
+        result = {
             "origin": origin,
             "destination": destination,
             "mode": mode,
@@ -243,11 +448,43 @@ async def get_directions(
             "total_steps": len(leg.get("steps", []))
         }
         
-    except requests.RequestException as e:
+        # Cache the result
+        await cache_set(cache_key, orjson.dumps(result), DIRECTIONS_CACHE_TTL)
+        
+        return result
+        
+    except HTTPException:
+        raise
+    except CircuitBreakerError:
+        raise HTTPException(status_code=503, detail="Google Maps temporarily unavailable")
+    except GoogleRetryableStatus as e:
+        raise HTTPException(status_code=503, detail=f"Google Maps API Error: {e.status}")
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"Network error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+@app.get("/places/directions")
+async def get_directions(
+    request: Request,
+    origin: str = Query(..., description="Starting location"),
+    destination: str = Query(..., description="Destination location"),
+    mode: str = Query("driving", description="Travel mode (driving, walking, bicycling, transit)")
+):
+    """Get directions between two locations."""
+    
+    result = await fetch_directions(origin, destination, mode)
+    return etag_response(request, orjson.dumps(result), DIRECTIONS_CACHE_TTL)
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Export the worker count so each spawned worker splits the QPS budget to match
+    os.environ.setdefault("WEB_CONCURRENCY", str(os.cpu_count() or 1))
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.environ["WEB_CONCURRENCY"]),
+        loop="uvloop",
+        http="httptools"
+    )
\ No newline at end of file
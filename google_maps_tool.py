@@ -2,9 +2,11 @@
 Simple OpenWebUI Tool that calls Maps Backend API
 """
 
-import requests
+import httpx
 from typing import Optional
 
+STARS = ("", "⭐", "⭐⭐", "⭐⭐⭐", "⭐⭐⭐⭐", "⭐⭐⭐⭐⭐")
+
 class Tools:
     def __init__(self):
         self.citation = True
@@ -14,11 +16,13 @@ class Tools:
 
     def __init__(self):
         self.valves = self.Valves()
+        # Shared client so calls to the backend reuse connections
+        self._client = httpx.AsyncClient(timeout=15.0)
 
-    def get_user_location(self) -> str:
+    async def get_user_location(self) -> str:
         """Get user's current location."""
         try:
-            response = requests.get(f"{self.valves.BACKEND_API_URL}/location", timeout=10)
+            response = await self._client.get(f"{self.valves.BACKEND_API_URL}/location", timeout=10)
             response.raise_for_status()
             data = response.json()
             return data["location"]
@@ -38,10 +42,9 @@ class Tools:
             if location:
                 params["location"] = location
             
-            response = requests.get(
+            response = await self._client.get(
                 f"{self.valves.BACKEND_API_URL}/places/nearby",
-                params=params,
-                timeout=15
+                params=params
             )
             response.raise_for_status()
             data = response.json()
@@ -50,18 +53,20 @@ class Tools:
                 return data["message"]
             
             # Format the response
-            result = f"📍 **Found {data['count']} {data['query']} near {data['location']}**\n\n"
+            parts = [f"📍 **Found {data['count']} {data['query']} near {data['location']}**\n\n"]
             
             for i, place in enumerate(data["places"], 1):
-                result += f"**{i}. {place['name']}**\n"
-                result += f"📍 {place['address']}\n"
+                parts.append(f"**{i}. {place['name']}**\n")
+                parts.append(f"📍 {place['address']}\n")
                 
                 if place["rating"]:
-                    stars = "⭐" * int(place["rating"])
-                    result += f"⭐ Rating: {place['rating']}/5 {stars}\n"
+                    stars = STARS[int(place["rating"])]
+                    parts.append(f"⭐ Rating: {place['rating']}/5 {stars}\n")
                 
-                result += f"🗺️ [View on Maps]({place['maps_url']})\n"
-                result += f"🧭 [Get Directions]({place['directions_url']})\n\n"
+                parts.append(f"🗺️ [View on Maps]({place['maps_url']})\n")
+                parts.append(f"🧭 [Get Directions]({place['directions_url']})\n\n")
+            
+            result = "".join(parts)
             
             # Embed map with proper sandbox permissions for Google Maps
             if __event_emitter__:
@@ -73,7 +78,7 @@ class Tools:
                 })
             return result
             
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return f"❌ Network error: {str(e)}"
         except Exception as e:
             return f"❌ Error: {str(e)}"
\ No newline at end of file